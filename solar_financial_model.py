@@ -1,8 +1,179 @@
 # python -m streamlit run solar_model.py
 import streamlit as st
-import numpy_financial as npf
+import numpy as np
 import pandas as pd
 
+# ---------------- HELPERS ----------------
+def geom(base, n):
+    """Powers base**0 .. base**(n-1) as a running product (avoids log/exp per element)."""
+    factors = np.full(n, float(base))
+    factors[:1] = 1.0
+    return np.cumprod(factors)
+
+def with_year0(values, year0=0.0):
+    """Per-operating-year array with the year-0 (construction) entry in front."""
+    col = np.empty(len(values) + 1, dtype=np.float64)
+    col[0] = year0
+    col[1:] = values
+    return col
+
+def whole(col):
+    """Table column rounded to whole units as int64 (half to even, like round())."""
+    return np.rint(col).astype(np.int64)
+
+def irr(cf):
+    """Internal rate of return of a cash flow series (NaN if there is none).
+
+    NPV is a polynomial in x = 1 / (1 + r), so every real positive root x gives a rate;
+    like numpy_financial.irr, the rate closest to zero is reported."""
+    x = np.roots(np.asarray(cf, dtype=np.float64)[::-1])
+    x = x[(x.imag == 0) & (x.real > 0)].real
+    if x.size == 0:
+        return np.nan
+    rates = 1 / x - 1
+    return rates[np.argmin(np.abs(rates))]
+
+@st.cache_data
+def compute_model(plant_capacity_mw, dc_overload_factor, cuf, project_life, degradation,
+                  capital_cost_per_mw, tariff, om_cost_per_mw, om_escalation, subsidy_amount_per_mw,
+                  loan_percent, loan_interest_rate, loan_tenure, depreciation_rate, tax_rate,
+                  return_on_equity):
+    """Run the full financial model; returns (summary_data, cash flow DataFrame).
+
+    Cached on the scalar inputs, so reruns triggered by unrelated widgets skip the math."""
+    # Base capital cost
+    base_capital_cost = capital_cost_per_mw * plant_capacity_mw
+    capital_cost = base_capital_cost * dc_overload_factor
+
+    # Total VGF/subsidy
+    subsidy_amount = subsidy_amount_per_mw * plant_capacity_mw
+
+    # Effective capital cost after VGF
+    effective_capital_cost = capital_cost - subsidy_amount
+
+    # Financing structure
+    loan_amount = effective_capital_cost * (loan_percent / 100)
+    equity_amount = effective_capital_cost - loan_amount
+
+    # Weighted Average Cost of Capital (WACC)
+    cost_of_debt = loan_interest_rate
+    cost_of_equity = return_on_equity
+    wacc = (loan_amount / effective_capital_cost) * cost_of_debt * (1 - tax_rate) + \
+           (equity_amount / effective_capital_cost) * cost_of_equity
+
+    # Energy generation (Year 1)
+    energy_y1_kwh = plant_capacity_mw * 1000 * 8760 * cuf * dc_overload_factor
+    om_cost_year1 = om_cost_per_mw * plant_capacity_mw
+
+    # --- Loan amortization schedule ---
+    if loan_tenure > 0 and loan_interest_rate > 0:
+        annuity_factor = (loan_interest_rate * (1 + loan_interest_rate) ** loan_tenure) / ((1 + loan_interest_rate) ** loan_tenure - 1)
+        annual_payment = loan_amount * annuity_factor
+    else:
+        annual_payment = 0
+
+    # --- Annual project cash flows (vectorised over project years) ---
+    energy_outputs = energy_y1_kwh * geom(1 - degradation, project_life)
+    om_costs = om_cost_year1 * geom(1 + om_escalation, project_life)
+    depreciation = effective_capital_cost * depreciation_rate
+    # In-place updates so only the arrays shown in the table are allocated
+    ebitdas = energy_outputs * tariff
+    ebitdas -= om_costs
+    profits = ebitdas - depreciation
+    taxes = np.maximum(profits, 0)
+    taxes *= tax_rate
+    project_cfs = ebitdas - taxes
+
+    # --- Loan schedule (closed-form annuity balances, zero after the tenure) ---
+    interest_payments = np.zeros(project_life)
+    principal_repayments = np.zeros(project_life)
+    loan_years = int(min(loan_tenure, project_life)) if loan_amount > 0 and annual_payment else 0
+    if loan_years > 0:
+        growth = geom(1 + loan_interest_rate, loan_years + 1)[1:]
+        balances = loan_amount * growth - annual_payment * (growth - 1) / loan_interest_rate
+        balance_prev = with_year0(balances[:-1], loan_amount)
+        interest_payments[:loan_years] = balance_prev * loan_interest_rate
+        principal_repayments[:loan_years] = annual_payment - interest_payments[:loan_years]
+
+    equity_cfs = project_cfs - interest_payments - principal_repayments
+
+    project_cf_arr = with_year0(project_cfs, -effective_capital_cost)
+    equity_cf_arr = with_year0(equity_cfs, -equity_amount)
+
+    # --- Discounted Cash Flows ---
+    wacc_disc = geom(1.0 + wacc, project_life + 1)
+    eq_disc = geom(1.0 + cost_of_equity, project_life + 1)
+    discounted_project_cf = project_cf_arr / wacc_disc
+    discounted_equity_cf = equity_cf_arr / eq_disc
+    cum_discounted_project_cf = np.cumsum(discounted_project_cf)
+    cum_discounted_equity_cf = np.cumsum(discounted_equity_cf)
+
+    # --- Metrics ---
+    npv_project_discounted = cum_discounted_project_cf[-1]
+    irr_project = irr(project_cf_arr)
+    irr_equity = irr(equity_cf_arr)
+    total_energy = energy_outputs.sum()
+
+    # --- Nominal LCOE ---
+    total_nominal_costs = project_cfs.sum()
+    total_nominal_energy = total_energy
+    lcoe = total_nominal_costs / total_nominal_energy if total_nominal_energy > 0 else None
+
+    # Payback (Equity)
+    cum_cf = np.cumsum(equity_cf_arr)
+    recovered = cum_cf >= 0
+    payback_years = int(recovered.argmax()) if recovered.any() else None
+    feasible = "Yes" if npv_project_discounted > 0 else "No"
+
+    summary_data = {
+        "Plant Capacity (AC)": f"{plant_capacity_mw:.2f} MW",
+        "DC Overloading Factor": f"{dc_overload_factor:.2f}",
+        "CUF": f"{cuf*100:.2f} %",
+        "Tariff": f"₹{tariff:.2f} / kWh",
+        "Project Life": f"{project_life} years",
+        "Annual Degradation": f"{degradation*100:.2f} %",
+        "Capital Cost (Base)": f"₹{base_capital_cost:,.0f}",
+        "Effective Capital Cost": f"₹{effective_capital_cost:,.0f}",
+        "Loan Portion": f"{loan_percent} %",
+        "WACC": f"{wacc*100:.2f} %",
+        "IRR (Project)": f"{irr_project*100:.2f} %",
+        "IRR (Equity)": f"{irr_equity*100:.2f} %",
+        "NPV (Discounted)": f"₹{npv_project_discounted:,.0f}",
+        "LCOE": f"₹{lcoe:.2f} / kWh",
+        "Payback Period": f"{payback_years} years",
+        "Feasibility": feasible,
+    }
+
+    # --- Cash flow table (with loan schedule) ---
+    loan_balances = with_year0(np.maximum(loan_amount - np.cumsum(principal_repayments), 0), loan_amount)
+
+    df = pd.DataFrame({
+        "Year": np.arange(project_life + 1),
+        "Energy Output (kWh)": whole(with_year0(energy_outputs)),
+        "O&M Cost (₹)": whole(with_year0(om_costs)),
+        "EBITDA (₹)": whole(with_year0(ebitdas)),
+        "Profit Before Tax (₹)": whole(with_year0(profits)),
+        "Tax (₹)": whole(with_year0(taxes)),
+        "Project CF (₹)": project_cf_arr,
+        "Interest (₹)": whole(with_year0(interest_payments)),
+        "Principal (₹)": whole(with_year0(principal_repayments)),
+        "Loan Balance (₹)": whole(loan_balances),
+        "Equity CF (₹)": equity_cf_arr,
+        "Discounted Project CF (₹)": discounted_project_cf,
+        "Discounted Equity CF (₹)": discounted_equity_cf,
+        "Cumulative Discounted Project CF (₹)": cum_discounted_project_cf,
+        "Cumulative Discounted Equity CF (₹)": cum_discounted_equity_cf,
+    })
+    return summary_data, df
+
+
+@st.cache_data
+def to_csv_bytes(*inputs):
+    """CSV export of the cash flow table, cached on the same scalar inputs as compute_model."""
+    _, df = compute_model(*inputs)
+    return df.to_csv(index=False).encode('utf-8')
+
+
 # --- Page Config ---
 st.set_page_config(page_title="Solar Power Plant Financial Model Dashboard", layout="centered")
 st.title("🌞 Solar Power Plant Financial Dashboard")
@@ -53,180 +224,46 @@ st.sidebar.header("Return Inputs")
 return_on_equity = st.sidebar.number_input("Expected Return on Equity (%)", value=14.0, step=0.5)/100
 
 # ---------------- CALCULATIONS ----------------
-# Base capital cost
-base_capital_cost = capital_cost_per_mw * plant_capacity_mw
-capital_cost = base_capital_cost * dc_overload_factor
-
-# Total VGF/subsidy
-subsidy_amount = subsidy_amount_per_mw * plant_capacity_mw
-
-# Effective capital cost after VGF
-effective_capital_cost = capital_cost - subsidy_amount
-
-# Financing structure
-loan_amount = effective_capital_cost * (loan_percent / 100)
-equity_amount = effective_capital_cost - loan_amount
-
-# Weighted Average Cost of Capital (WACC)
-cost_of_debt = loan_interest_rate
-cost_of_equity = return_on_equity
-wacc = (loan_amount / effective_capital_cost) * cost_of_debt * (1 - tax_rate) + \
-       (equity_amount / effective_capital_cost) * cost_of_equity
-
-# Energy generation (Year 1)
-energy_y1_kwh = plant_capacity_mw * 1000 * 8760 * cuf * dc_overload_factor
-om_cost_year1 = om_cost_per_mw * plant_capacity_mw
-
-# --- Loan amortization schedule ---
-if loan_tenure > 0 and loan_interest_rate > 0:
-    annuity_factor = (loan_interest_rate * (1 + loan_interest_rate) ** loan_tenure) / ((1 + loan_interest_rate) ** loan_tenure - 1)
-    annual_payment = loan_amount * annuity_factor
-else:
-    annual_payment = 0
-
-# Cash flow initialization
-project_cf_list = [-effective_capital_cost]
-equity_cf_list = [-equity_amount]
-energy_outputs, om_costs, profits, ebitdas = [], [], [], []
-
-remaining_loan = loan_amount
-principal_repayments = []
-interest_payments = []
-
-for year in range(1, project_life + 1):
-    energy = energy_y1_kwh * ((1 - degradation) ** (year - 1))
-    om_cost = om_cost_year1 * ((1 + om_escalation) ** (year - 1))
-    revenue = energy * tariff
-    depreciation = effective_capital_cost * depreciation_rate
-    ebitda = revenue - om_cost
-    ebit = ebitda - depreciation
-    tax = tax_rate * max(ebit, 0)
-    project_cf = ebitda - tax
-
-    if year <= loan_tenure and remaining_loan > 0:
-        interest = remaining_loan * loan_interest_rate
-        principal = annual_payment - interest
-        remaining_loan -= principal
-    else:
-        interest = 0
-        principal = 0
-
-    interest_payments.append(interest)
-    principal_repayments.append(principal)
-    equity_cf = project_cf - interest - principal
-
-    project_cf_list.append(project_cf)
-    equity_cf_list.append(equity_cf)
-
-    energy_outputs.append(energy)
-    om_costs.append(om_cost)
-    profits.append(ebit)
-    ebitdas.append(ebitda)
-
-# --- Discounted Cash Flows ---
-discounted_project_cf = [cf / ((1 + wacc) ** i) for i, cf in enumerate(project_cf_list)]
-discounted_equity_cf = [cf / ((1 + cost_of_equity) ** i) for i, cf in enumerate(equity_cf_list)]
-cum_discounted_project_cf = pd.Series(discounted_project_cf).cumsum()
-cum_discounted_equity_cf = pd.Series(discounted_equity_cf).cumsum()
-
-# --- Metrics ---
-npv_project_discounted = sum(discounted_project_cf)
-irr_project = npf.irr(project_cf_list)
-irr_equity = npf.irr(equity_cf_list)
-total_energy = sum(energy_outputs)
-
-# --- Nominal LCOE ---
-total_nominal_costs = sum(project_cf_list[1:])
-total_nominal_energy = total_energy
-lcoe = total_nominal_costs / total_nominal_energy if total_nominal_energy > 0 else None
-
-# Payback (Equity)
-cum_cf = pd.Series(equity_cf_list).cumsum()
-payback_years = next((i for i, x in enumerate(cum_cf) if x >= 0), None)
-feasible = "Yes" if npv_project_discounted > 0 else "No"
+model_inputs = (
+    plant_capacity_mw, dc_overload_factor, cuf, project_life, degradation,
+    capital_cost_per_mw, tariff, om_cost_per_mw, om_escalation, subsidy_amount_per_mw,
+    loan_percent, loan_interest_rate, loan_tenure, depreciation_rate, tax_rate,
+    return_on_equity,
+)
+# Reruns with unchanged inputs (e.g. the download click) reuse this session's results
+# directly instead of unpickling them from the st.cache_data store
+if st.session_state.get("model_inputs") != model_inputs:
+    st.session_state["model_results"] = (*compute_model(*model_inputs), to_csv_bytes(*model_inputs))
+    st.session_state["model_inputs"] = model_inputs
+summary_data, df, csv = st.session_state["model_results"]
 
 # --- Project Summary Table ---
 st.subheader("📋 Project Summary")
 
-summary_data = {
-    "Plant Capacity (AC)": f"{plant_capacity_mw:.2f} MW",
-    "DC Overloading Factor": f"{dc_overload_factor:.2f}",
-    "CUF": f"{cuf*100:.2f} %",
-    "Tariff": f"₹{tariff:.2f} / kWh",
-    "Project Life": f"{project_life} years",
-    "Annual Degradation": f"{degradation*100:.2f} %",
-    "Capital Cost (Base)": f"₹{base_capital_cost:,.0f}",
-    "Effective Capital Cost": f"₹{effective_capital_cost:,.0f}",
-    "Loan Portion": f"{loan_percent} %",
-    "WACC": f"{wacc*100:.2f} %",
-    "IRR (Project)": f"{irr_project*100:.2f} %",
-    "IRR (Equity)": f"{irr_equity*100:.2f} %",
-    "NPV (Discounted)": f"₹{npv_project_discounted:,.0f}",
-    "LCOE": f"₹{lcoe:.2f} / kWh",
-    "Payback Period": f"{payback_years} years",
-    "Feasibility": feasible,
-}
-
-# Display as two columns
-keys = list(summary_data.keys())
-values = list(summary_data.values())
-mid_index = len(keys)//2
+# Display as two columns, one table each
+summary_df = pd.DataFrame({"Value": list(summary_data.values())},
+                          index=pd.Index(list(summary_data.keys()), name="Metric"))
+mid_index = len(summary_df)//2
 col1, col2 = st.columns(2)
 with col1:
-    for i in range(mid_index):
-        st.markdown(f"**{keys[i]}:** {values[i]}")
+    st.table(summary_df.iloc[:mid_index])
 with col2:
-    for i in range(mid_index, len(keys)):
-        st.markdown(f"**{keys[i]}:** {values[i]}")
+    st.table(summary_df.iloc[mid_index:])
 
 # --- Detailed Cash Flow Table (with loan schedule) ---
 st.subheader("💰 Project Cash Flow Table (with Loan Details)")
 
-loan_balances = [loan_amount]
-current_balance = loan_amount
-for p in principal_repayments:
-    current_balance = max(current_balance - p, 0)
-    loan_balances.append(current_balance)
-
-df = pd.DataFrame({
-    "Year": list(range(project_life + 1)),
-    "Energy Output (kWh)": [0] + [round(e) for e in energy_outputs],
-    "O&M Cost (₹)": [0] + [round(c) for c in om_costs],
-    "EBITDA (₹)": [0] + [round(e) for e in ebitdas],
-    "Profit Before Tax (₹)": [0] + [round(p) for p in profits],
-    "Tax (₹)": [0] + [round(tax_rate * max(p, 0)) for p in profits],
-    "Project CF (₹)": project_cf_list,
-    "Interest (₹)": [0] + [round(i) for i in interest_payments],
-    "Principal (₹)": [0] + [round(p) for p in principal_repayments],
-    "Loan Balance (₹)": [round(b) for b in loan_balances],
-    "Equity CF (₹)": equity_cf_list,
-    "Discounted Project CF (₹)": discounted_project_cf,
-    "Discounted Equity CF (₹)": discounted_equity_cf,
-    "Cumulative Discounted Project CF (₹)": cum_discounted_project_cf,
-    "Cumulative Discounted Equity CF (₹)": cum_discounted_equity_cf,
-})
-
+# Formatted client-side; sprintf-style formats have no thousands separator, so use the
+# locale format with whole-number precision (units are already in the column headers)
 st.dataframe(
-    df.style.format({
-        "Energy Output (kWh)": "{:,.0f}",
-        "O&M Cost (₹)": "₹{:,.0f}",
-        "EBITDA (₹)": "₹{:,.0f}",
-        "Profit Before Tax (₹)": "₹{:,.0f}",
-        "Tax (₹)": "₹{:,.0f}",
-        "Project CF (₹)": "₹{:,.0f}",
-        "Interest (₹)": "₹{:,.0f}",
-        "Principal (₹)": "₹{:,.0f}",
-        "Loan Balance (₹)": "₹{:,.0f}",
-        "Equity CF (₹)": "₹{:,.0f}",
-        "Discounted Project CF (₹)": "₹{:,.0f}",
-        "Discounted Equity CF (₹)": "₹{:,.0f}",
-        "Cumulative Discounted Project CF (₹)": "₹{:,.0f}",
-        "Cumulative Discounted Equity CF (₹)": "₹{:,.0f}",
-    }),
-    use_container_width=True
+    df,
+    column_config={
+        col: st.column_config.NumberColumn(format="localized", step=1)
+        for col in df.columns if col != "Year"
+    },
+    width="stretch"
 )
 
 # --- Download CSV ---
 st.subheader("📥 Download Cash Flow CSV")
-csv = df.to_csv(index=False).encode('utf-8')
 st.download_button("Download CSV", csv, "solar_project_cashflow.csv", "text/csv")